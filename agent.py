@@ -2,40 +2,211 @@
 
 
 import asyncio
+import atexit
+import itertools
 import os
 import random
+import re
+import shutil
+import socket
 import subprocess
 import time
 import sys
 import tempfile
-import requests
-from bs4 import BeautifulSoup
+import threading
+from dataclasses import dataclass
 from dotenv import load_dotenv
 import json
 
 load_dotenv()
 
-# For scheduling (Level 3 periodic tasks)
-import schedule
-
 # For cross-platform checks
 import platform
 
-# For DevTools approach on Windows/Linux
-import websocket  # pip install websocket-client
+# platform.system() calls uname(); look it up once.
+PLATFORM = platform.system().lower()
+
+# Playwright (Level 1/3) and websocket-client (DevTools, Level 2) are imported where they
+# are first needed, so each mode only pays for the dependencies it actually uses.
+
+# Chromium flags shared by every Playwright launch (anti-detection measures).
+BROWSER_LAUNCH_ARGS = [
+    "--start-maximized",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-dev-shm-usage"
+]
+
+# Resource types skipped by BrowserAgent in fast mode.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+# Clicks the first product title containing the (lower-cased) search term; returns its index or -1.
+CLICK_MATCHING_PRODUCT_JS = """(term) => {
+    const els = [...document.querySelectorAll('#tbodyid .card-title a')];
+    const i = els.findIndex(e => e.innerText.toLowerCase().includes(term));
+    if (i >= 0) els[i].click();
+    return i;
+}"""
+
+# True when the page shows a CAPTCHA (visible text, or a captcha widget/iframe).
+CAPTCHA_PRESENT_JS = """() => /captcha/i.test(document.body ? document.body.innerText : '') ||
+    !!document.querySelector('[id*=captcha i], [class*=captcha i], iframe[src*=captcha i]')"""
+
+# Constant functions called through Runtime.callFunctionOn; user input arrives as arguments.
+DEVTOOLS_LOGIN_FN = """function(username, password) {
+    document.querySelector('#login2')?.click();
+    document.getElementById('loginusername').value = username;
+    document.getElementById('loginpassword').value = password;
+    let btn = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
+    if (btn) btn.click();
+}"""
+DEVTOOLS_OPEN_PRODUCT_FN = """async function(term, timeoutMs) {
+    const deadline = Date.now() + timeoutMs;
+    const sleep = () => new Promise(r => setTimeout(r, 50));
+    // Let the home listing render and tag it, then wait until the Phones listing has replaced it.
+    while (!document.querySelector('#tbodyid .card-title a') && Date.now() < deadline) await sleep();
+    document.querySelectorAll('#tbodyid .card').forEach(card => card.dataset.stale = '1');
+    document.querySelector('#itemc')?.click();
+    while ((document.querySelector('#tbodyid .card[data-stale]') || !document.querySelector('#tbodyid .card-title a'))
+           && Date.now() < deadline) await sleep();
+    const items = document.querySelectorAll('#tbodyid .card-title a');
+    for (let i = 0; i < items.length; i++) {
+        if (items[i].innerText.toLowerCase().includes(term)) {
+            items[i].click();
+            return true;
+        }
+    }
+    return false;
+}"""
+
+# DevTools errors meaning a cached remote object id belongs to a document that is gone.
+STALE_OBJECT_ERRORS = ("Could not find object with given id", "Cannot find context with specified id")
+
+# Conversation commands (Level 3), compiled once at import.
+LOGIN_COMMAND = re.compile(r"login", re.IGNORECASE)
+SEARCH_COMMAND = re.compile(r"search(.*)", re.IGNORECASE | re.DOTALL)
+EXIT_COMMAND = re.compile(r"exit", re.IGNORECASE)
+
+# Dedicated Chrome profile for the Level 2 agents. Chrome only honours --remote-debugging-port
+# for a non-default profile that no other running Chrome owns.
+DEVTOOLS_PROFILE_DIR = os.path.join(tempfile.gettempdir(), "chrome-devtools-agent")
+
+# A navigation tags the outgoing document first, so the load wait can't be satisfied by it.
+MARK_NAVIGATING_JS = "window.__agentNavigating = true"
+NAVIGATED_JS = "!window.__agentNavigating && document.readyState === 'complete'"
+
+# Set DEBUG_APPLESCRIPT=1 to echo every AppleScript statement and per-poll wait errors.
+DEBUG_APPLESCRIPT = bool(os.environ.get("DEBUG_APPLESCRIPT"))
+
+# Marker evaluated after each statement sent to the interactive osascript process.
+OSA_SENTINEL = "__osascript_done__"
+
+# Truthy once Demoblaze shows the "Welcome <user>" link after a successful login.
+LOGGED_IN_JS = "(function() { var el = document.querySelector('#nameofuser'); return !!(el && el.innerText.trim()); })()"
+
+# Product links in the listing. The home page already lists products, so after a category click
+# waiting for links proves nothing: MARK_LISTING_JS tags the cards shown before the click, and
+# LISTING_REPLACED_JS is true once the re-rendered listing has none of them left.
+LISTING_LINK_SELECTOR = "#tbodyid .card-title a"
+MARK_LISTING_JS = "document.querySelectorAll('#tbodyid .card').forEach(function(card) { card.dataset.stale = '1'; })"
+LISTING_REPLACED_JS = ("(function() { return !document.querySelector('#tbodyid .card[data-stale]') && "
+                       "!!document.querySelector('#tbodyid .card-title a'); })()")
+
+# Constant scripts issued by the AppleScript flows; their AppleScript wrappers are prebuilt below.
+DOCUMENT_COMPLETE_JS = "document.readyState === 'complete'"
+CLICK_LOGIN_JS = 'document.querySelector("#login2").click();'
+SUBMIT_LOGIN_JS = """
+    var loginButton = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
+    if (loginButton) { loginButton.click(); }
+"""
+OPEN_PHONES_JS = MARK_LISTING_JS + """;
+    var phonesLink = document.querySelector('#itemc');
+    if (phonesLink) { phonesLink.click(); }
+"""
+PRODUCT_DETAILS_JS = """
+    (function() {
+        var name = document.querySelector('.name') ? document.querySelector('.name').innerText : 'No name found';
+        var price = document.querySelector('.price-container') ? document.querySelector('.price-container').innerText : 'No price found';
+        var description = document.querySelector('#more-information p') ? document.querySelector('#more-information p').innerText : 'No description found';
+        return JSON.stringify({name: name, price: price, description: description});
+    })()
+"""
+
+# Escapes JS source for embedding in an AppleScript string literal.
+APPLESCRIPT_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+def build_applescript(js_command: str):
+    """Build the one-line AppleScript statement that runs `js_command` in Chrome's active tab."""
+    safe_js = js_command.translate(APPLESCRIPT_ESCAPES)
+    return f'tell application "Google Chrome" to execute active tab of front window javascript "{safe_js}"'
+
+
+def element_present_js(selector: str):
+    return f"(function() {{ return !!document.querySelector('{selector}'); }})()"
+
+
+# AppleScript wrappers for the constant scripts, built once at import. Scripts carrying user
+# input (credentials, search terms) are built per call and never kept around.
+PREBUILT_APPLESCRIPTS = {js: build_applescript(js) for js in (
+    DOCUMENT_COMPLETE_JS, LOGGED_IN_JS, OPEN_PHONES_JS, LISTING_REPLACED_JS,
+    element_present_js("#login2"), element_present_js(LISTING_LINK_SELECTOR), element_present_js(".name"),
+    f"({PRODUCT_DETAILS_JS})",
+)}
+
+
+@dataclass(frozen=True, slots=True)
+class DemoblazeConfig:
+    """Demoblaze credentials and search term, read and validated once from the environment (.env)."""
+    user: str
+    password: str
+    search: str = "Samsung"
+
+    @classmethod
+    def from_env(cls):
+        """Build the config from the environment; ValueError if the credentials are missing."""
+        env = os.environ
+        user, password = env.get("DEMOBLAZE_USER"), env.get("DEMOBLAZE_PASS")
+        if not user or not password:
+            raise ValueError("DEMOBLAZE_USER and DEMOBLAZE_PASS must be set in your environment (.env).")
+        return cls(user=user, password=password, search=env.get("DEMOBLAZE_SEARCH", "Samsung"))
+
+
+# Process-wide Playwright driver shared by every BrowserAgent and the Level 3 pool.
+_playwright_instance = None
+_playwright_loop = None
+
+
+async def get_playwright():
+    """Return the shared Playwright driver, starting it on first use in the running event loop."""
+    global _playwright_instance, _playwright_loop
+    loop = asyncio.get_running_loop()
+    if _playwright_instance is None or _playwright_loop is not loop:
+        from playwright.async_api import async_playwright
+        _playwright_instance = await async_playwright().start()
+        _playwright_loop = loop
+    return _playwright_instance
+
+
+async def stop_playwright():
+    """Stop the shared Playwright driver; call once when the top-level coroutine finishes."""
+    global _playwright_instance, _playwright_loop
+    if _playwright_instance is not None and _playwright_loop is asyncio.get_running_loop():
+        await _playwright_instance.stop()
+    _playwright_instance = None
+    _playwright_loop = None
 
-from playwright.async_api import async_playwright
 
 # Bonus Enhancements for the Automation Challenge
 
 class BonusAutomationFeatures:
     @staticmethod
-    async def detect_captcha(page):
+    async def detect_captcha(page, report: bool = True):
         """Detect if a CAPTCHA is present on the page."""
         try:
-            content = await page.content()
-            if "captcha" in content.lower():
-                print("⚠️ CAPTCHA detected on the page. Please solve it manually.")
+            # Evaluate in-page so only a boolean crosses CDP instead of the full HTML.
+            if await page.evaluate(CAPTCHA_PRESENT_JS):
+                if report:
+                    print("⚠️ CAPTCHA detected on the page. Please solve it manually.")
                 return True
             return False
         except Exception as e:
@@ -43,26 +214,42 @@ class BonusAutomationFeatures:
             return False
 
     @staticmethod
-    def save_session(cookies, session_file="session.json"):
-        """Save session cookies to a file."""
+    async def wait_for_captcha_solved(page, poll_interval: float = 1, timeout: float = 300):
+        """Poll without blocking the event loop until the CAPTCHA is gone from the page."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while await BonusAutomationFeatures.detect_captcha(page, report=False):
+            if loop.time() >= deadline:
+                raise RuntimeError(f"CAPTCHA was not solved within {timeout} seconds.")
+            await asyncio.sleep(poll_interval)
+        print("CAPTCHA cleared, continuing.")
+
+    @staticmethod
+    def save_session(storage_state, session_file="session.json"):
+        """Save the browser storage state (cookies + localStorage) to a file."""
         try:
             with open(session_file, "w") as f:
-                json.dump(cookies, f)
-            print(f"Session cookies saved to {session_file}")
+                json.dump(storage_state, f)
+            print(f"Session state saved to {session_file}")
         except Exception as e:
-            print(f"Failed to save session cookies: {e}")
+            print(f"Failed to save session state: {e}")
 
     @staticmethod
     def load_session(session_file="session.json"):
-        """Load session cookies from a file, if available."""
+        """
+        Load a Playwright storage state from a file, if available.
+        Older session files holding a bare cookie list are wrapped into the storage state format.
+        """
         if os.path.exists(session_file):
             try:
                 with open(session_file, "r") as f:
-                    cookies = json.load(f)
-                print(f"Session cookies loaded from {session_file}")
-                return cookies
+                    state = json.load(f)
+                if isinstance(state, list):
+                    state = {"cookies": state, "origins": []}
+                print(f"Session state loaded from {session_file}")
+                return state
             except Exception as e:
-                print(f"Failed to load session cookies: {e}")
+                print(f"Failed to load session state: {e}")
         return None
 
     @staticmethod
@@ -86,29 +273,75 @@ class BonusAutomationFeatures:
 
 # Level 1: Playwright Automation (BrowserAgent)
 class BrowserAgent:
-    def __init__(self, proxy: str = None):
-        """Initialize with an optional proxy."""
+    def __init__(self, proxy: str = None, browser=None, context=None, fast_mode: bool = True,
+                 headless: bool = True, slow_mo_ms: int = 0, interactive: bool = False):
+        """
+        Initialize with an optional proxy. A shared `browser` or `context` (e.g. from
+        Level3Agent's pool) can be passed in; it is then left open when the flow ends.
+        With `fast_mode`, images, media, fonts and stylesheets are not downloaded.
+        `interactive` opens a visible window with a random human-like slow_mo delay.
+        """
         self.playwright = None
-        self.browser = None
+        self.browser = browser
+        self.context = context
         self.page = None
         self.proxy = proxy
+        self.session_restored = False
+        self.fast_mode = fast_mode
+        self.headless = False if interactive else headless
+        self.slow_mo_ms = random.randint(100, 500) if interactive else slow_mo_ms
+        self.owns_browser = browser is None and context is None
+        self.owns_context = context is None
 
     async def initialize(self):
         """Initialize browser with anti-detection measures."""
-        launch_args = [
-            "--start-maximized",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-dev-shm-usage"
-        ]
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=False,
-            args=launch_args,
-            slow_mo=random.randint(100, 500)
-        )
-        self.page = await self.browser.new_page()
+        if self.context is None:
+            if self.browser is None:
+                self.playwright = await get_playwright()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=self.headless,
+                    args=BROWSER_LAUNCH_ARGS,
+                    slow_mo=self.slow_mo_ms
+                )
+            # BONUS: Reuse the stored session so warm starts can skip the login sequence
+            storage_state = BonusAutomationFeatures.load_session()
+            self.session_restored = storage_state is not None
+            self.context = await self.browser.new_context(storage_state=storage_state)
+        else:
+            self.session_restored = bool(await self.context.cookies())
+        self.page = await self.context.new_page()
+        if self.fast_mode:
+            await self.page.route("**/*", self.block_heavy_resources)
         await self.page.set_viewport_size({"width": 1366, "height": 768})
 
+    @staticmethod
+    async def block_heavy_resources(route):
+        """Abort requests the flow never looks at; only the DOM and scripts are needed."""
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def close(self):
+        """
+        Close whatever this agent opened; shared browsers/contexts stay alive and the
+        shared Playwright driver is left for stop_playwright().
+        """
+        if self.owns_context and self.context:
+            await self.context.close()
+        elif self.page:
+            await self.page.close()
+        if self.owns_browser and self.browser:
+            await self.browser.close()
+
+    async def is_logged_in(self, timeout: int = 5000):
+        """Check whether the restored session is still logged in (the 'Welcome' link is shown)."""
+        try:
+            await self.page.wait_for_selector("#nameofuser", state="visible", timeout=timeout)
+            return True
+        except Exception:
+            return False
+
     async def navigate_with_retry(self, url: str, max_retries: int = 3):
         """Navigate to a URL with retry logic."""
         for attempt in range(max_retries):
@@ -125,17 +358,22 @@ class BrowserAgent:
 
     async def login(self, username: str, password: str):
         """Log into the website using selectors and bonus enhancements."""
-        if not username or not password:
-            raise ValueError("DEMOBLAZE_USER and DEMOBLAZE_PASS must be set in your environment (.env).")
         try:
             if not await self.navigate_with_retry("https://www.demoblaze.com"):
                 raise RuntimeError("Failed to navigate to the website.")
 
             # BONUS: Check for CAPTCHA presence
             if await BonusAutomationFeatures.detect_captcha(self.page):
-                print("CAPTCHA detected. Please solve it manually, then press Enter to continue.")
-                input("Press Enter after CAPTCHA is solved...")
-            
+                if self.headless:
+                    # Nobody can solve it without a visible window; don't hold up a scheduled run.
+                    raise RuntimeError("CAPTCHA detected in a headless run.")
+                print("CAPTCHA detected. Please solve it in the browser window; the flow resumes automatically.")
+                await BonusAutomationFeatures.wait_for_captcha_solved(self.page)
+
+            if self.session_restored and await self.is_logged_in():
+                print("✓ Restored session is still logged in, skipping login (Playwright)")
+                return
+
             # Open login modal and perform login
             await self.page.click("#login2")
             await self.page.wait_for_selector("#logInModal.show", timeout=15000)
@@ -146,9 +384,8 @@ class BrowserAgent:
             await BonusAutomationFeatures.wait_for_dynamic_content(self.page, "#nameofuser")
             print("✓ Login sequence completed successfully (Playwright)")
 
-            # BONUS: Save session cookies after login
-            cookies = await self.page.context.cookies()
-            BonusAutomationFeatures.save_session(cookies)
+            # BONUS: Save session state (cookies + localStorage) after login
+            BonusAutomationFeatures.save_session(await self.context.storage_state())
         except Exception as e:
             # BONUS: Attempt graceful recovery before re-raising the error
             await BonusAutomationFeatures.graceful_recovery(self.page, "Login error encountered. Reloading page...")
@@ -161,29 +398,30 @@ class BrowserAgent:
         and interact with it (add to cart), using bonus enhancements.
         """
         try:
+            # Tag the home listing so the wait below only passes once Phones has replaced it.
+            await self.page.wait_for_selector(LISTING_LINK_SELECTOR, timeout=15000)
+            await self.page.evaluate(MARK_LISTING_JS)
             await self.page.click("a#itemc:has-text('Phones')")
             # BONUS: Wait for the product listing to load dynamically.
-            await BonusAutomationFeatures.wait_for_dynamic_content(self.page, "#tbodyid")
-            product_cards = await self.page.query_selector_all("#tbodyid .card-title")
-            for card in product_cards:
-                text = await card.inner_text()
-                if search_term.lower() in text.lower():
-                    parent_card = await card.query_selector("xpath=ancestor::div[contains(@class, 'card')]")
-                    await parent_card.click()
-                    # Wait for product details to load.
-                    await BonusAutomationFeatures.wait_for_dynamic_content(self.page, ".name")
-                    product_name = await self.page.inner_text(".name")
-                    product_price = await self.page.inner_text(".price-container")
-                    print(f"Product Name: {product_name}")
-                    print(f"Product Price: {product_price}")
-                    await self.page.click("a:has-text('Add to cart')")
-                    print("✓ Product added to cart successfully (Playwright)")
-                    await asyncio.sleep(2)
-                    await self.page.click("a:has-text('Cart')")
-                    await self.page.wait_for_selector("#tbodyid .success", timeout=15000)
-                    print("✓ Verified item in the cart (Playwright)")
-                    return
-            raise RuntimeError(f"No product found matching '{search_term}'.")
+            await self.page.wait_for_function(LISTING_REPLACED_JS, timeout=30000)
+            # Filter the titles and click the match in-browser: one round-trip instead of one per card.
+            index = await self.page.evaluate(CLICK_MATCHING_PRODUCT_JS, search_term.lower())
+            if index < 0:
+                raise RuntimeError(f"No product found matching '{search_term}'.")
+            # Wait for product details to load.
+            await BonusAutomationFeatures.wait_for_dynamic_content(self.page, ".name")
+            product_name, product_price = await asyncio.gather(
+                self.page.inner_text(".name"),
+                self.page.inner_text(".price-container")
+            )
+            print(f"Product Name: {product_name}")
+            print(f"Product Price: {product_price}")
+            await self.page.click("a:has-text('Add to cart')")
+            print("✓ Product added to cart successfully (Playwright)")
+            await asyncio.sleep(2)
+            await self.page.click("a:has-text('Cart')")
+            await self.page.wait_for_selector("#tbodyid .success", timeout=15000)
+            print("✓ Verified item in the cart (Playwright)")
         except Exception as e:
             # BONUS: Attempt graceful recovery before re-raising the error.
             await BonusAutomationFeatures.graceful_recovery(self.page, "Product interaction error. Reloading page...")
@@ -195,72 +433,372 @@ class BrowserAgent:
         Execute the full Playwright automation workflow.
         Accepts a search term from DEMOBLAZE_SEARCH (default "Samsung").
         Integrates bonus features for CAPTCHA detection, session management,
-        dynamic content waiting, and graceful recovery.
+        dynamic content waiting, and graceful recovery. Returns True if the flow succeeded.
         """
         try:
+            cfg = DemoblazeConfig.from_env()
             await self.initialize()
-            username = os.getenv("DEMOBLAZE_USER")
-            password = os.getenv("DEMOBLAZE_PASS")
-            await self.login(username, password)
-            search_term = os.getenv("DEMOBLAZE_SEARCH", "Samsung")
-            await self.select_product_and_interact(search_term)
+            await self.login(cfg.user, cfg.password)
+            await self.select_product_and_interact(cfg.search)
+            return True
         except Exception as e:
             print(f"\n❌ CRITICAL FAILURE (Playwright): {str(e)}")
+            return False
         finally:
-            if self.browser:
-                await self.browser.close()
-                if self.playwright:
-                    await self.playwright.stop()
+            await self.close()
 
 
 # Level 2: Native Browser Integration (AppleScript/DevTools)
+class AppleScriptRunner:
+    """
+    A long-lived interactive osascript coprocess. Starting osascript and connecting to
+    Chrome over Apple Events is paid once; every statement afterwards is one stdin write.
+    """
+
+    def __init__(self):
+        self._osa = None
+        # Statements share one stdin/stdout pipe, so callers on different threads take turns.
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _process(self):
+        """Return the osascript process, (re)starting it if needed."""
+        if self._osa is None or self._osa.poll() is not None:
+            # "-s s" prints results in source form, so strings come back as one quoted literal.
+            # An absolute path and close_fds=False keep subprocess on its posix_spawn fast path.
+            self._osa = subprocess.Popen(["/usr/bin/osascript", "-i", "-s", "s"], stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                                         close_fds=False)
+        return self._osa
+
+    def run(self, statement: str):
+        """
+        Run a single-line AppleScript statement and return its result.
+        A sentinel string is evaluated right after it so we know where its output ends.
+        """
+        if DEBUG_APPLESCRIPT:
+            print(f"[osascript] {statement}")
+        with self._lock:
+            results, errors = self._exchange(statement)
+        if errors and not results:
+            raise RuntimeError(f"AppleScript command failed: {' '.join(errors)}")
+        return self.parse_result("\n".join(results))
+
+    def _exchange(self, statement: str):
+        """Write one statement plus the sentinel and collect (result lines, error lines)."""
+        osa = self._process()
+        osa.stdin.write(f'{statement}\n"{OSA_SENTINEL}"\n')
+        osa.stdin.flush()
+        results, errors = [], []
+        for line in osa.stdout:
+            line = line.strip()
+            while line.startswith(">>"):
+                line = line[2:].strip()
+            if OSA_SENTINEL in line:
+                break
+            if line.startswith("=>"):
+                results.append(line[2:].strip())
+            elif results:
+                # Continuation of a multi-line result.
+                results.append(line)
+            elif line:
+                errors.append(line)
+        else:
+            raise RuntimeError("AppleScript command failed: osascript exited unexpectedly.")
+        return results, errors
+
+    @staticmethod
+    def parse_result(output: str):
+        """Unquote an AppleScript string literal; other values (true, 3, missing value) pass through."""
+        if len(output) >= 2 and output.startswith('"') and output.endswith('"'):
+            try:
+                # AppleScript escapes (\" \\ \n \t) are a subset of JSON's.
+                return json.loads(output, strict=False)
+            except json.JSONDecodeError:
+                return output[1:-1]
+        return output
+
+    def close(self):
+        """Shut down the osascript process."""
+        if self._osa and self._osa.poll() is None:
+            self._osa.stdin.close()
+            self._osa.terminate()
+        self._osa = None
+
+
+class DevToolsClient:
+    """
+    A Chrome DevTools Protocol connection to the browser endpoint with one page target
+    attached in flatten mode. Shared by both Level 2 agents.
+    """
+
+    def __init__(self):
+        self.ws = None
+        self.session_id = None
+        self._msg_ids = itertools.count(1)
+
+    @property
+    def connected(self):
+        return self.ws is not None and self.session_id is not None
+
+    def connect(self, ws_url: str, activate: bool = False):
+        """
+        Connect to the browser WebSocket and attach to its first page target, bringing it
+        to the front with Target.activateTarget if `activate` is set. Returns True on success.
+        """
+        import websocket  # pip install websocket-client
+        self.close()
+        try:
+            # Chrome 111+ rejects DevTools connections carrying an Origin it was not started with
+            # (--remote-allow-origins); websocket-client sends one by default.
+            self.ws = websocket.create_connection(ws_url, suppress_origin=True)
+            page_target = self.wait_for_page_target()
+            if not page_target:
+                print("No page target returned by Target.getTargets.")
+                self.close()
+                return False
+            if activate:
+                self.send("Target.activateTarget", {"targetId": page_target["targetId"]})
+            attached = self.send("Target.attachToTarget", {"targetId": page_target["targetId"], "flatten": True})
+            self.session_id = attached["result"]["sessionId"]
+            return True
+        except Exception as e:
+            print(f"Could not connect to DevTools: {e}")
+            self.close()
+            return False
+
+    def wait_for_page_target(self, timeout=10, poll_interval=0.1):
+        """Find the first page target over the browser connection (Target.getTargets)."""
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            targets = self.send("Target.getTargets")["result"]["targetInfos"]
+            page_target = next((t for t in targets if t.get("type") == "page"), None)
+            if page_target:
+                return page_target
+            time.sleep(poll_interval)
+        return None
+
+    def send(self, method: str, params: dict = None):
+        responses = self.send_many([(method, params)])
+        return responses[0] if responses else None
+
+    def send_many(self, commands):
+        """
+        Send several (method, params) commands back-to-back, then read until the
+        response matching each command id has arrived. Events and other unrelated
+        messages are skipped. Responses are returned in command order.
+        """
+        if not self.ws:
+            print("No WebSocket connection to DevTools available.")
+            return None
+        ids = []
+        for method, params in commands:
+            msg_id = next(self._msg_ids)
+            payload = {
+                "id": msg_id,
+                "method": method,
+                "params": params or {}
+            }
+            # Page commands go through the attached session; Target.* commands address the browser.
+            if self.session_id and not method.startswith("Target."):
+                payload["sessionId"] = self.session_id
+            self.ws.send(json.dumps(payload))
+            ids.append(msg_id)
+        pending = set(ids)
+        responses = {}
+        while pending:
+            message = json.loads(self.ws.recv())
+            if message.get("id") in pending:
+                responses[message["id"]] = message
+                pending.discard(message["id"])
+        return [responses[msg_id] for msg_id in ids]
+
+    def close(self):
+        if self.ws:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+        self.ws = None
+        self.session_id = None
+
+
+class DevToolsChrome:
+    """
+    Chrome on the dedicated DevTools profile, shared by both Level 2 agents. A Chrome that
+    still owns the profile (left open by an earlier step or run) is reused: a second launch
+    would only hand off to it, so we attach through its DevToolsActivePort and navigate its tab.
+    """
+
+    def __init__(self, executable: str, proxy: str = None, extension_path: str = None):
+        self.executable = executable
+        self.proxy = proxy
+        self.extension_path = extension_path
+        self.debug_port = 9222
+        # Chrome writes the browser WebSocket endpoint to DevToolsActivePort in this profile dir.
+        self.user_data_dir = DEVTOOLS_PROFILE_DIR
+        self.active_port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        self.devtools = DevToolsClient()
+        self.process = None
+
+    def command(self, url: str):
+        cmd = [
+            self.executable,
+            f"--remote-debugging-port={self.debug_port}",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--new-window",
+            url
+        ]
+        if self.proxy:
+            proxy_clean = self.proxy.replace("http://", "").replace("https://", "")
+            cmd.extend([f"--proxy-server=http={proxy_clean};https={proxy_clean}",
+                        "--proxy-bypass-list=<-loopback>"])
+        if self.extension_path:
+            cmd.append(f"--load-extension={self.extension_path}")
+        return cmd
+
+    def open(self, url: str, activate: bool = False):
+        """
+        Show `url` in a DevTools-attached tab, reusing a running Chrome or launching one.
+        Returns True once attached (and, for a reused Chrome, once the page has loaded).
+        """
+        if self.devtools.connected or self.attach_running_chrome(activate):
+            try:
+                loaded = self.navigate(url)
+            except Exception as e:
+                print(f"Running Chrome is gone ({e}); launching a new one.")
+                self.devtools.close()
+            else:
+                if not loaded:
+                    # Chrome still owns the profile, so a relaunch would only hand off to it again.
+                    print("Error: the running Chrome did not load the page in time.")
+                    return False
+                print("Reusing the running Chrome instance.")
+                return True
+        cmd = self.command(url)
+        print(f"Launching Chrome with command: {' '.join(cmd)}")
+        # No live Chrome owns the profile (checked above), so any DevToolsActivePort left is stale.
+        if os.path.exists(self.active_port_file):
+            os.remove(self.active_port_file)
+        # close_fds=False lets subprocess use posix_spawn instead of fork+exec; Python opens its own
+        # descriptors non-inheritable (PEP 446), so nothing leaks. Don't add preexec_fn/cwd/pass_fds here.
+        self.process = subprocess.Popen(cmd, close_fds=False)
+        try:
+            ws_url = self.wait_for_devtools()
+        except RuntimeError as e:
+            print(f"Could not connect to DevTools: {e}")
+            return False
+        if not self.devtools.connect(ws_url, activate=activate):
+            return False
+        print("Connected to DevTools WebSocket.")
+        return True
+
+    def navigate(self, url: str, timeout=10, poll_interval=0.05):
+        """
+        Load `url` in the attached tab; True once the new document has loaded, False on
+        timeout. Raises if the connection is gone.
+        """
+        self.devtools.send("Runtime.evaluate", {"expression": MARK_NAVIGATING_JS})
+        self.devtools.send("Page.navigate", {"url": url})
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            resp = self.devtools.send("Runtime.evaluate", {"expression": NAVIGATED_JS, "returnByValue": True})
+            if (resp or {}).get("result", {}).get("result", {}).get("value") is True:
+                return True
+            time.sleep(poll_interval)
+        return False
+
+    def read_devtools_endpoint(self):
+        """Return (port, browser WebSocket URL) from DevToolsActivePort; OSError/ValueError if not written yet."""
+        with open(self.active_port_file, "r") as f:
+            port, browser_path = f.read().split()[:2]
+        return int(port), f"ws://127.0.0.1:{port}{browser_path}"
+
+    def attach_running_chrome(self, activate: bool = False):
+        """Connect to a Chrome that already owns the profile, if its DevToolsActivePort is still live."""
+        try:
+            port, ws_url = self.read_devtools_endpoint()
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+        except (OSError, ValueError):
+            return False
+        return self.devtools.connect(ws_url, activate=activate)
+
+    def wait_for_devtools(self, timeout=15, poll_interval=0.1):
+        """Wait for Chrome to write DevToolsActivePort and return the browser WebSocket URL."""
+        start_time = time.time()
+        while True:
+            try:
+                return self.read_devtools_endpoint()[1]
+            except (OSError, ValueError):
+                if time.time() - start_time >= timeout:
+                    raise RuntimeError("Chrome did not expose a DevTools endpoint in time.")
+                time.sleep(poll_interval)
+
+    def close(self):
+        """Drop the DevTools connection and stop the Chrome we launched; True if one was stopped."""
+        self.devtools.close()
+        if self.process:
+            self.process.terminate()
+            self.process = None
+            return True
+        return False
+
+
 class AppleScriptNativeAgent:
     def __init__(self, browser: str = "chrome", proxy: str = None, extension_path: str = None):
         self.browser = browser.lower()
         self.proxy = proxy
         self.extension_path = extension_path
+        self.runner = AppleScriptRunner()
+        self.chrome = DevToolsChrome("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+                                     proxy=proxy, extension_path=extension_path)
+        # DevTools fast path: while connected, JS goes straight to the page over CDP
+        # instead of osascript -> Apple Events -> Chrome.
+        self.devtools = self.chrome.devtools
+
+    def run_applescript(self, statement: str):
+        return self.runner.run(statement)
 
     def execute_js(self, js_command: str):
-        safe_js = js_command.replace('"', '\\"')
-        script = f'''tell application "Google Chrome"
-    activate
-    delay 2
-    tell front window to set theTab to active tab
-    tell theTab
-        execute JavaScript "{safe_js}"
-    end tell
-end tell'''
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".applescript", delete=False) as f:
-            script_path = f.name
-            f.write(script)
-        result = subprocess.run(["osascript", script_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        os.remove(script_path)
-        if result.returncode != 0:
-            raise RuntimeError(f"AppleScript command failed: {result.stderr.strip()}")
-        return result.stdout.strip()
+        if self.devtools.connected:
+            try:
+                resp = self.devtools.send("Runtime.evaluate", {"expression": js_command, "returnByValue": True})
+            except Exception as e:
+                print(f"DevTools connection lost ({e}); falling back to AppleScript.")
+                self.devtools.close()
+            else:
+                return self.devtools_result(resp)
+        script = PREBUILT_APPLESCRIPTS.get(js_command) or build_applescript(js_command)
+        return self.run_applescript(script)
+
+    def batch_js(self, statements: list[str]):
+        """Run several JS statements as one script, paying the osascript/DevTools round trip once."""
+        return self.execute_js("\n".join(statements))
 
     def execute_js_extract(self, js_command: str):
-        safe_js = js_command.replace('"', '\\"')
-        script = f'''tell application "Google Chrome"
-            activate
-            delay 2
-            tell front window to set theTab to active tab
-            tell theTab
-                set jsResult to execute JavaScript "({safe_js})"
-            end tell
-        end tell
-        return jsResult'''
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".applescript", delete=False) as f:
-            script_path = f.name
-            f.write(script)
-        result = subprocess.run(["osascript", script_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        os.remove(script_path)
-        if result.returncode != 0:
-            raise RuntimeError(f"AppleScript command failed: {result.stderr.strip()}")
-        return result.stdout.strip()
-
-    def wait_for_element(self, js_selector: str, timeout=2):
-        check_js = f"(function() {{ return !!document.querySelector('{js_selector}'); }})()"
+        return self.execute_js(f"({js_command})")
+
+    @staticmethod
+    def devtools_result(resp: dict):
+        """Render a Runtime.evaluate response the way osascript prints the same JS result."""
+        result = resp.get("result", {})
+        if "error" in resp or "exceptionDetails" in result:
+            details = resp.get("error") or result["exceptionDetails"]
+            raise RuntimeError(f"DevTools evaluation failed: {details}")
+        value = result.get("result", {}).get("value")
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return "" if value is None else str(value)
+
+    def close(self):
+        """Shut down the DevTools connection and the persistent osascript process."""
+        self.devtools.close()
+        self.runner.close()
+
+    def wait_for_condition(self, check_js: str, timeout=10, poll_interval=0.1):
+        """Poll a JS boolean expression until it is true or the timeout expires."""
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
@@ -268,78 +806,74 @@ end tell'''
                 if "true" in output.lower():
                     return True
             except RuntimeError as e:
-                print(f"Waiting for element error: {e}")
-            time.sleep(1)
+                if DEBUG_APPLESCRIPT:
+                    print(f"Waiting for condition error: {e}")
+            time.sleep(poll_interval)
         return False
 
+    def wait_for_element(self, js_selector: str, timeout=2, poll_interval=0.1):
+        return self.wait_for_condition(element_present_js(js_selector), timeout=timeout, poll_interval=poll_interval)
+
+    def wait_for_ready(self, timeout=10, poll_interval=0.1):
+        """Wait until the active tab reports document.readyState === 'complete'."""
+        return self.wait_for_condition(DOCUMENT_COMPLETE_JS, timeout=timeout,
+                                       poll_interval=poll_interval)
+
     def launch_browser(self, url: str):
-        print("Launching Chrome in native mode (macOS)...")
-        executable = "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"
-        cmd = [executable, "--new-window", url]
-        if self.proxy:
-            proxy_clean = self.proxy.replace("http://", "").replace("https://", "")
-            cmd.extend([f"--proxy-server=http={proxy_clean};https={proxy_clean}",
-                        "--user-data-dir=/tmp/chrome-proxy-test",
-                        "--proxy-bypass-list=<-loopback>"])
-        if self.extension_path:
-            cmd.append(f"--load-extension={self.extension_path}")
-        print(f"Using command: {' '.join(cmd)}")
-        subprocess.Popen(cmd)
-        print("Waiting for Chrome to open...")
-        time.sleep(10)
-        subprocess.run(['osascript', '-e', 'tell application "Google Chrome" to activate'])
-        time.sleep(3)
+        print("Opening Chrome in native mode (macOS)...")
+        if not self.chrome.open(url, activate=True):
+            # DevTools is unavailable; drive the front Chrome window over AppleScript instead.
+            self.run_applescript('tell application "Google Chrome" to activate')
+        if not self.wait_for_ready():
+            print("Error: Chrome did not finish loading the page (macOS).")
+            return False
         print("Browser window should now be in focus (macOS).")
+        return True
+
+    @staticmethod
+    def login_statements(username: str, password: str):
+        """
+        The whole login as one batch. The modal's inputs are in the page from the start and
+        logIn() reads them directly, so there is no need to wait for the modal to open.
+        """
+        return [
+            CLICK_LOGIN_JS,
+            f'document.getElementById("loginusername").value = {json.dumps(username)};',
+            f'document.getElementById("loginpassword").value = {json.dumps(password)};',
+            SUBMIT_LOGIN_JS,
+        ]
 
     def login_only(self, url: str, username: str, password: str):
-        self.launch_browser(url)
+        if not self.launch_browser(url):
+            return
         print("Attempting to click the login button (login_only)...")
         if not self.wait_for_element("#login2", timeout=5):
             print("Error: Login button (#login2) not found within timeout.")
             return
-        self.execute_js('document.querySelector("#login2").click();')
-        time.sleep(3)
         print("Filling credentials (login_only)...")
-        if not self.wait_for_element("#loginusername", timeout=5):
-            print("Login modal (#loginusername) not found within timeout.")
-            return
-        self.execute_js(f'document.getElementById("loginusername").value = "{username}";')
-        self.execute_js(f'document.getElementById("loginpassword").value = "{password}";')
-        self.execute_js("""
-            var loginButton = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
-            if (loginButton) { loginButton.click(); }
-        """)
+        self.batch_js(self.login_statements(username, password))
         print("✓ AppleScript: Completed login_only steps.")
 
     def search_only(self, search_term: str):
-        self.launch_browser("https://www.demoblaze.com")
-        time.sleep(3)
+        if not self.launch_browser("https://www.demoblaze.com"):
+            return
         print("Navigating to phones category (search_only)...")
-        self.execute_js("""
-            var phonesLink = document.querySelector('#itemc');
-            if (phonesLink) { phonesLink.click(); }
-        """)
-        time.sleep(3)
+        self.wait_for_element(LISTING_LINK_SELECTOR, timeout=10)
+        self.execute_js(OPEN_PHONES_JS)
+        self.wait_for_condition(LISTING_REPLACED_JS, timeout=10)
         print(f"Searching for {search_term} (search_only)...")
         self.execute_js(f"""
             var elems = document.querySelectorAll('#tbodyid .card-title a');
             for (var i = 0; i < elems.length; i++) {{
-                if (elems[i].innerText.toLowerCase().includes('{search_term.lower()}')) {{
+                if (elems[i].innerText.toLowerCase().includes({json.dumps(search_term.lower())})) {{
                     elems[i].click();
                     break;
                 }}
             }}
         """)
-        time.sleep(3)
+        self.wait_for_element(".name", timeout=10)
         print("Extracting product details (search_only) ...")
-        result = self.execute_js_extract("""
-            (function() {
-                var name = document.querySelector('.name') ? document.querySelector('.name').innerText : 'No name found';
-                var price = document.querySelector('.price-container') ? document.querySelector('.price-container').innerText : 'No price found';
-                var description = document.querySelector('#more-information p') ? document.querySelector('#more-information p').innerText : 'No description found';
-                return JSON.stringify({name: name, price: price, description: description});
-            })()
-        """)
+        result = self.execute_js_extract(PRODUCT_DETAILS_JS)
         if result:
             try:
                 data = json.loads(result)
@@ -350,50 +884,32 @@ end tell'''
             print("No data extracted in search_only.")
 
     def complete_flow(self, url: str, username: str, password: str, search_term: str):
-        self.launch_browser(url)
+        if not self.launch_browser(url):
+            return
         print("Attempting to click the login button...")
         if not self.wait_for_element("#login2", timeout=2):
             print("Error: Login button (#login2) not found within timeout.")
             return
-        self.execute_js('document.querySelector("#login2").click();')
-        time.sleep(3)
         print("Performing native login using AppleScript and JavaScript...")
-        if not self.wait_for_element("#loginusername", timeout=2):
-            print("Login modal (#loginusername) not found within timeout.")
-            return
-        self.execute_js(f'document.getElementById("loginusername").value = "{username}";')
-        self.execute_js(f'document.getElementById("loginpassword").value = "{password}";')
-        self.execute_js("""
-            var loginButton = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
-            if (loginButton) { loginButton.click(); }
-        """)
-        time.sleep(3)
+        self.batch_js(self.login_statements(username, password))
+        self.wait_for_condition(LOGGED_IN_JS, timeout=10)
         print("Navigating to phones category...")
-        self.execute_js("""
-            var phonesLink = document.querySelector('#itemc');
-            if (phonesLink) { phonesLink.click(); }
-        """)
-        time.sleep(2)
+        self.wait_for_element(LISTING_LINK_SELECTOR, timeout=10)
+        self.execute_js(OPEN_PHONES_JS)
+        self.wait_for_condition(LISTING_REPLACED_JS, timeout=10)
         print(f"Searching for {search_term} product...")
         self.execute_js(f"""
             var elems = document.querySelectorAll('#tbodyid .card-title a');
             for (var i = 0; i < elems.length; i++) {{
-                if (elems[i].innerText.toLowerCase().includes('{search_term.lower()}')) {{
+                if (elems[i].innerText.toLowerCase().includes({json.dumps(search_term.lower())})) {{
                     elems[i].click();
                     break;
                 }}
             }}
         """)
-        time.sleep(3)
+        self.wait_for_element(".name", timeout=10)
         print("Extracting product details (AppleScript JS) ...")
-        result = self.execute_js_extract("""
-            (function() {
-                var name = document.querySelector('.name') ? document.querySelector('.name').innerText : 'No name found';
-                var price = document.querySelector('.price-container') ? document.querySelector('.price-container').innerText : 'No price found';
-                var description = document.querySelector('#more-information p') ? document.querySelector('#more-information p').innerText : 'No description found';
-                return JSON.stringify({name: name, price: price, description: description});
-            })()
-        """)
+        result = self.execute_js_extract(PRODUCT_DETAILS_JS)
         if result:
             try:
                 data = json.loads(result)
@@ -409,107 +925,142 @@ class WindowsLinuxNativeAgent:
         self.browser = browser.lower()
         self.proxy = proxy
         self.extension_path = extension_path
-        self.chrome_process = None
-        self.debug_port = 9222
-        self.ws = None
-
-    def launch_browser(self, url: str):
-        if platform.system().lower() == "windows":
+        if PLATFORM == "windows":
             executable = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
         else:
-            executable = "google-chrome"
-        cmd = [
-            executable,
-            f"--remote-debugging-port={self.debug_port}",
-            "--new-window",
-            url
-        ]
-        if self.proxy:
-            proxy_clean = self.proxy.replace("http://", "").replace("https://", "")
-            cmd.extend([f"--proxy-server=http={proxy_clean};https={proxy_clean}",
-                        "--user-data-dir=/tmp/chrome-proxy-test",
-                        "--proxy-bypass-list=<-loopback>"])
-        if self.extension_path:
-            cmd.append(f"--load-extension={self.extension_path}")
-        print(f"Launching Chrome for Windows/Linux with command: {' '.join(cmd)}")
-        self.chrome_process = subprocess.Popen(cmd)
-        time.sleep(5)
-        try:
-            resp = requests.get(f"http://127.0.0.1:{self.debug_port}/json")
-            targets = resp.json()
-            if targets:
-                ws_url = targets[0].get("webSocketDebuggerUrl", None)
-                if ws_url:
-                    self.ws = websocket.create_connection(ws_url)
-                    print("Connected to DevTools WebSocket.")
-                else:
-                    print("No webSocketDebuggerUrl found in /json response.")
-            else:
-                print("No targets returned from /json endpoint.")
-        except Exception as e:
-            print(f"Could not connect to DevTools: {e}")
+            # posix_spawn is only used for an executable given with a directory, so resolve it up front.
+            executable = shutil.which("google-chrome") or "google-chrome"
+        self.chrome = DevToolsChrome(executable, proxy=proxy, extension_path=extension_path)
+        self.devtools = self.chrome.devtools
+        self._global_object_id = None
+
+    def launch_browser(self, url: str):
+        # Any cached global object belongs to the document being replaced.
+        self._global_object_id = None
+        return self.chrome.open(url)
 
     def devtools_send(self, method: str, params: dict = None):
-        if not self.ws:
-            print("No WebSocket connection to DevTools available.")
-            return
-        if params is None:
-            params = {}
-        msg_id = int(time.time())
-        payload = {
-            "id": msg_id,
-            "method": method,
-            "params": params
-        }
-        self.ws.send(json.dumps(payload))
-        response = self.ws.recv()
-        return response
+        return self.devtools.send(method, params)
 
-    def devtools_evaluate(self, expression: str):
+    def devtools_evaluate(self, expression: str, await_promise: bool = False):
         params = {
             "expression": expression,
-            "returnByValue": True
+            "returnByValue": True,
+            "awaitPromise": await_promise
         }
         resp = self.devtools_send("Runtime.evaluate", params)
         return resp
 
+    def devtools_evaluate_value(self, expression: str, await_promise: bool = False):
+        """Evaluate an expression and return its unwrapped value (None on failure)."""
+        resp = self.devtools_evaluate(expression, await_promise=await_promise)
+        if not resp:
+            return None
+        try:
+            return resp["result"]["result"].get("value")
+        except (KeyError, TypeError, AttributeError):
+            return None
+
+    def await_in_page(self, promise_js: str, timeout=10):
+        """
+        Evaluate a promise that settles in-page and block on the single response.
+        If the evaluation fails (e.g. the execution context was destroyed by a
+        navigation) it is re-issued until the timeout expires.
+        """
+        deadline = time.time() + timeout
+        while self.devtools.connected:
+            remaining_ms = int(max(deadline - time.time(), 0) * 1000)
+            value = self.devtools_evaluate_value(promise_js.replace("__TIMEOUT__", str(remaining_ms)),
+                                                 await_promise=True)
+            if value is not None:
+                return value is True
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return False
+
+    def wait_for_condition(self, check_js: str, timeout=10, poll_interval=0.05):
+        """Poll a JS boolean expression until it is true or the timeout expires."""
+        start_time = time.time()
+        while self.devtools.connected and time.time() - start_time < timeout:
+            if self.devtools_evaluate_value(check_js) is True:
+                return True
+            time.sleep(poll_interval)
+        return False
+
+    def wait_for_element(self, js_selector: str, timeout=10):
+        """Resolve as soon as `js_selector` matches, using an in-page MutationObserver."""
+        selector = json.dumps(js_selector)
+        wait_js = f"""
+            new Promise(resolve => {{
+                if (document.querySelector({selector})) return resolve(true);
+                const observer = new MutationObserver(() => {{
+                    if (document.querySelector({selector})) {{ observer.disconnect(); resolve(true); }}
+                }});
+                observer.observe(document, {{childList: true, subtree: true, attributes: true}});
+                setTimeout(() => {{ observer.disconnect(); resolve(false); }}, __TIMEOUT__);
+            }})
+        """
+        return self.await_in_page(wait_js, timeout=timeout)
+
+    def wait_for_ready(self, timeout=10):
+        """Resolve on the window load event (or immediately if the page is already loaded)."""
+        ready_js = """
+            new Promise(resolve => {
+                if (document.readyState === 'complete') return resolve(true);
+                window.addEventListener('load', () => resolve(true), {once: true});
+                setTimeout(() => resolve(false), __TIMEOUT__);
+            })
+        """
+        return self.await_in_page(ready_js, timeout=timeout)
+
     def close_browser(self):
-        if self.ws:
-            self.ws.close()
-        if self.chrome_process:
-            self.chrome_process.terminate()
+        if self.chrome.close():
             print("Closed Chrome (Windows/Linux remote debugging).")
 
-    def login_only(self, url: str, username: str, password: str):
-        self.launch_browser(url)
-        time.sleep(2)
-        self.devtools_evaluate("document.querySelector('#login2')?.click();")
-        time.sleep(2)
-        fill_js = f"""
-            document.getElementById('loginusername').value = '{username}';
-            document.getElementById('loginpassword').value = '{password}';
-            let btn = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
-            if (btn) btn.click();
-        """
-        self.devtools_evaluate(fill_js)
-        print("✓ WindowsLinuxNativeAgent: login_only steps done.")
+    def devtools_call(self, function_declaration: str, *args, await_promise: bool = False):
+        """
+        Call a constant JS function with JSON arguments via Runtime.callFunctionOn, so user
+        input is never spliced into JS source. The function runs with `this` bound to the
+        page's global object, whose remote id is cached until a navigation invalidates it.
+        """
+        resp = None
+        for _ in range(2):
+            if self._global_object_id is None:
+                resp = self.devtools_send("Runtime.evaluate", {"expression": "globalThis"})
+                try:
+                    self._global_object_id = resp["result"]["result"]["objectId"]
+                except (KeyError, TypeError):
+                    return resp
+            resp = self.devtools_send("Runtime.callFunctionOn", {
+                "functionDeclaration": function_declaration,
+                "objectId": self._global_object_id,
+                "arguments": [{"value": arg} for arg in args],
+                "returnByValue": True,
+                "awaitPromise": await_promise
+            })
+            error = (resp or {}).get("error", {}).get("message", "")
+            if not any(stale in error for stale in STALE_OBJECT_ERRORS):
+                return resp
+            # The cached global object belonged to a previous document; resolve it again.
+            self._global_object_id = None
+        return resp
 
-    def search_only(self, search_term: str):
-        self.launch_browser("https://www.demoblaze.com")
-        time.sleep(2)
-        self.devtools_evaluate("document.querySelector('#itemc')?.click();")
-        time.sleep(2)
-        search_js = f"""
-            let items = document.querySelectorAll('#tbodyid .card-title a');
-            for (let i=0; i < items.length; i++) {{
-                if (items[i].innerText.toLowerCase().includes('{search_term.lower()}')) {{
-                    items[i].click();
-                    break;
-                }}
-            }}
+    def devtools_login(self, username: str, password: str):
+        """Open the login modal, fill the credentials and submit in a single call."""
+        return self.devtools_call(DEVTOOLS_LOGIN_FN, username, password)
+
+    def devtools_open_product(self, search_term: str, timeout=10):
+        """
+        Click the Phones category, wait in-page for the listing and click the first
+        product matching `search_term`, all in a single awaited call.
         """
-        self.devtools_evaluate(search_js)
-        time.sleep(3)
+        return self.devtools_call(DEVTOOLS_OPEN_PRODUCT_FN, search_term.lower(), int(timeout * 1000),
+                                  await_promise=True)
+
+    def devtools_extract_product(self):
+        """Wait for the product page and return its details as a JSON response."""
+        self.wait_for_element(".name")
         extract_js = """
         JSON.stringify({
             name: document.querySelector('.name')?.innerText || 'No name',
@@ -517,45 +1068,36 @@ class WindowsLinuxNativeAgent:
             description: document.querySelector('#more-information p')?.innerText || 'No description'
         })
         """
-        resp = self.devtools_evaluate(extract_js)
+        return self.devtools_evaluate(extract_js)
+
+    def login_only(self, url: str, username: str, password: str):
+        if not self.launch_browser(url):
+            self.close_browser()
+            return
+        self.wait_for_ready()
+        self.devtools_login(username, password)
+        print("✓ WindowsLinuxNativeAgent: login_only steps done.")
+
+    def search_only(self, search_term: str):
+        if not self.launch_browser("https://www.demoblaze.com"):
+            self.close_browser()
+            return
+        self.wait_for_ready()
+        self.devtools_open_product(search_term)
+        resp = self.devtools_extract_product()
         print("WindowsLinuxNativeAgent search_only response:", resp)
         self.close_browser()
 
     def complete_flow(self, url: str, username: str, password: str, search_term: str):
-        print(f"Starting native flow for {platform.system().lower()} ...")
-        self.launch_browser(url)
-        time.sleep(2)
-        self.devtools_evaluate("document.querySelector('#login2')?.click();")
-        time.sleep(2)
-        fill_creds_js = f"""
-            document.getElementById('loginusername').value = '{username}';
-            document.getElementById('loginpassword').value = '{password}';
-            let btn = document.querySelector('button.btn.btn-primary[onclick="logIn()"]');
-            if (btn) btn.click();
-        """
-        self.devtools_evaluate(fill_creds_js)
-        time.sleep(3)
-        self.devtools_evaluate("document.querySelector('#itemc').click();")
-        time.sleep(2)
-        search_js = f"""
-            var items = document.querySelectorAll('#tbodyid .card-title a');
-            for (var i=0; i<items.length; i++) {{
-                if (items[i].innerText.toLowerCase().includes('{search_term.lower()}')) {{
-                    items[i].click();
-                    break;
-                }}
-            }}
-        """
-        self.devtools_evaluate(search_js)
-        time.sleep(3)
-        extract_js = """
-        JSON.stringify({
-            name: document.querySelector('.name')?.innerText || 'No name',
-            price: document.querySelector('.price-container')?.innerText || 'No price',
-            description: document.querySelector('#more-information p')?.innerText || 'No description'
-        })
-        """
-        extract_resp = self.devtools_evaluate(extract_js)
+        print(f"Starting native flow for {PLATFORM} ...")
+        if not self.launch_browser(url):
+            self.close_browser()
+            return
+        self.wait_for_ready()
+        self.devtools_login(username, password)
+        self.wait_for_condition(LOGGED_IN_JS)
+        self.devtools_open_product(search_term)
+        extract_resp = self.devtools_extract_product()
         print("DevTools Evaluate Response:", extract_resp)
         self.close_browser()
 
@@ -565,26 +1107,35 @@ class ConversationAgent:
     def __init__(self):
         self.context = {}
         self.history = []
+        # Checked in order, first match wins (login takes priority over search, search over exit).
+        self._routes = [
+            (LOGIN_COMMAND, self._handle_login),
+            (SEARCH_COMMAND, self._handle_search),
+            (EXIT_COMMAND, self._handle_exit),
+        ]
 
     def handle_command(self, command: str) -> str:
         self.history.append(command)
-        lower_cmd = command.lower()
-        if "login" in lower_cmd:
-            self.context["action"] = "login"
-            return "Understood, I'll just do login steps next."
-        elif "search" in lower_cmd:
-            parts = command.split("search", 1)
-            if len(parts) > 1:
-                term = parts[1].strip()
-                self.context["search_term"] = term
-                self.context["action"] = "search"
-                return f"Okay, I'll just search for '{term}' next."
-            else:
-                return "Could not parse a search term, e.g. 'search Samsung'."
-        elif "exit" in lower_cmd:
-            return "exit"
-        else:
-            return "I didn't understand. Try 'login', 'search <something>', or 'exit'."
+        for pattern, handler in self._routes:
+            match = pattern.search(command)
+            if match:
+                return handler(match)
+        return "I didn't understand. Try 'login', 'search <something>', or 'exit'."
+
+    def _handle_login(self, match) -> str:
+        self.context["action"] = "login"
+        return "Understood, I'll just do login steps next."
+
+    def _handle_search(self, match) -> str:
+        term = match.group(1).strip()
+        if not term:
+            return "Could not parse a search term, e.g. 'search Samsung'."
+        self.context["search_term"] = term
+        self.context["action"] = "search"
+        return f"Okay, I'll just search for '{term}' next."
+
+    def _handle_exit(self, match) -> str:
+        return "exit"
 
     def get_context(self):
         return self.context
@@ -593,10 +1144,69 @@ class ConversationAgent:
         self.context.clear()
         self.history.clear()
 
+# Bytes read from a piped stdin past the last line handed out by read_stdin_line.
+_stdin_pending = b""
+
+
+def read_stdin_line():
+    """
+    Read one line straight from the stdin file descriptor. Unlike input(), os.read holds
+    no lock on sys.stdin's buffer, so a daemon thread blocked here can't abort the
+    interpreter shutdown that follows Ctrl-C.
+    """
+    global _stdin_pending
+    while b"\n" not in _stdin_pending:
+        chunk = os.read(sys.stdin.fileno(), 4096)
+        if not chunk:
+            if not _stdin_pending:
+                raise EOFError
+            break
+        _stdin_pending += chunk
+    line, _, _stdin_pending = _stdin_pending.partition(b"\n")
+    return line.decode(errors="replace").rstrip("\r")
+
+
+async def read_input(prompt: str):
+    """
+    Read a line on a daemon thread. Unlike run_in_executor, a pending read never keeps
+    asyncio.run's executor shutdown (and so Ctrl-C) waiting for the user to press Enter.
+    A terminal keeps input() and its line editing; piped stdin is read with read_stdin_line.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    interactive = sys.stdin.isatty()
+    if not interactive:
+        print(prompt, end="", flush=True)
+
+    def deliver(line, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(line)
+
+    def reader():
+        try:
+            line, error = (input(prompt) if interactive else read_stdin_line()), None
+        except Exception as e:
+            line, error = None, e
+        try:
+            loop.call_soon_threadsafe(deliver, line, error)
+        except RuntimeError:
+            pass  # The loop closed while we were waiting for input.
+
+    threading.Thread(target=reader, daemon=True).start()
+    return await future
+
+
 class Level3Agent:
     def __init__(self):
         self.conv_agent = ConversationAgent()
-        self.os_type = platform.system().lower()
+        self.os_type = PLATFORM
+        # Browser pool for periodic runs, kept alive between runs.
+        self._browser = None
+        self._context_pool = []
 
     def pick_native_agent(self, proxy=None, extension_path=None):
         if self.os_type == "darwin":
@@ -607,14 +1217,24 @@ class Level3Agent:
             print("Unsupported OS for native integration.")
             return None
 
-    def run_conversation_loop(self, proxy=None, extension_path=None):
+    async def run_conversation_loop(self, proxy=None, extension_path=None):
+        """
+        Read and run commands. Stdin is read on a daemon thread and the synchronous native
+        agents run in the loop's executor, so periodic tasks keep ticking on the same event loop.
+        """
+        loop = asyncio.get_running_loop()
         agent = self.pick_native_agent(proxy, extension_path)
         if not agent:
             print("No suitable native agent found for your OS.")
             return
         print("\nEnter commands:\n - 'login' => do only the login steps\n - 'search Samsung' => do only the search steps\n - 'exit' => quit\n")
         while True:
-            user_input = input("You> ")
+            try:
+                user_input = await read_input("You> ")
+            except EOFError:
+                # stdin closed (Ctrl-D or piped input ran out): end the conversation like 'exit'.
+                print("\nConversation ended.")
+                break
             resp = self.conv_agent.handle_command(user_input)
             if resp == "exit":
                 print("Conversation ended.")
@@ -622,38 +1242,198 @@ class Level3Agent:
             print("Agent:", resp)
             ctx = self.conv_agent.get_context()
             if ctx.get("action") == "login":
-                username = os.getenv("DEMOBLAZE_USER")
-                password = os.getenv("DEMOBLAZE_PASS")
-                if not username or not password:
-                    print("Error: DEMOBLAZE_USER and DEMOBLAZE_PASS must be set in your environment (.env).")
+                try:
+                    cfg = DemoblazeConfig.from_env()
+                except ValueError as e:
+                    print(f"Error: {e}")
                     break
-                agent.login_only("https://www.demoblaze.com", username, password)
+                await loop.run_in_executor(None, agent.login_only, "https://www.demoblaze.com", cfg.user, cfg.password)
                 self.conv_agent.clear_context()
             elif ctx.get("action") == "search":
                 term = ctx.get("search_term", "Samsung")
-                agent.search_only(term)
+                await loop.run_in_executor(None, agent.search_only, term)
                 self.conv_agent.clear_context()
 
-    def run_periodic_task(self):
+    async def get_browser(self):
+        """Lazily launch the pooled browser shared by all periodic runs, relaunching it if it died."""
+        if self._browser is None or not self._browser.is_connected():
+            # Contexts of a crashed browser are dead too.
+            self._context_pool.clear()
+            playwright = await get_playwright()
+            self._browser = await playwright.chromium.launch(
+                headless=True,
+                args=BROWSER_LAUNCH_ARGS,
+                slow_mo=0
+            )
+        return self._browser
+
+    async def new_context(self):
+        browser = await self.get_browser()
+        return await browser.new_context(storage_state=BonusAutomationFeatures.load_session())
+
+    async def warm_up(self, contexts=1):
+        """Preheat the browser and `contexts` browser contexts before the first run."""
+        while len(self._context_pool) < contexts:
+            self._context_pool.append(await self.new_context())
+
+    async def acquire_context(self):
+        await self.get_browser()
+        if self._context_pool:
+            return self._context_pool.pop()
+        return await self.new_context()
+
+    async def release_context(self, context):
+        self._context_pool.append(context)
+
+    async def discard_context(self, context):
+        """Close a context whose run failed instead of handing it to the next run."""
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"[Periodic Task] Could not close context: {e}")
+
+    async def run_periodic_task_async(self):
         print("\n[Periodic Task] Running Level 1 (Playwright) flow.\n")
-        agent = BrowserAgent()
-        asyncio.run(agent.execute_flow())
+        context = await self.acquire_context()
+        succeeded = False
+        try:
+            succeeded = await BrowserAgent(context=context).execute_flow()
+        finally:
+            if succeeded:
+                await self.release_context(context)
+            else:
+                await self.discard_context(context)
+
+    async def shutdown(self):
+        """Close the pooled contexts and browser; a browser that already died is not an error."""
+        for context in self._context_pool:
+            await self.discard_context(context)
+        self._context_pool.clear()
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                print(f"[Periodic Task] Could not close the browser: {e}")
+            self._browser = None
+        await stop_playwright()
 
-    def schedule_periodic_tasks(self, interval_minutes=1):
-        schedule.every(interval_minutes).minutes.do(self.run_periodic_task)
+    async def _periodic(self, interval_minutes=1):
+        """
+        Run the Playwright flow every `interval_minutes` on the event loop's clock. Ticks
+        stay on a fixed cadence however long a run takes; an overrunning run skips the
+        ticks it missed instead of firing them back-to-back. A failing run (e.g. Playwright
+        not installed, browser launch failed) is reported and retried on the next tick.
+        """
+        loop = asyncio.get_running_loop()
+        interval = interval_minutes * 60
+        try:
+            try:
+                await self.warm_up()
+            except Exception as e:
+                print(f"[Periodic Task] Warm-up failed: {e!r}")
+            next_run = loop.time()
+            while True:
+                try:
+                    await self.run_periodic_task_async()
+                except Exception as e:
+                    print(f"[Periodic Task] Run failed: {e!r}")
+                next_run += interval
+                now = loop.time()
+                if next_run < now:
+                    next_run += ((now - next_run) // interval + 1) * interval
+                await asyncio.sleep(next_run - now)
+        finally:
+            await self.shutdown()
+
+    async def schedule_periodic_tasks(self, interval_minutes=1):
         print(f"Scheduling periodic tasks every {interval_minutes} minute(s).")
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        await self._periodic(interval_minutes)
+
+    async def converse_and_schedule(self, proxy=None, extension_path=None, interval_minutes=1):
+        """Run the conversation and the periodic tasks concurrently; leaving the conversation stops both."""
+        scheduler = asyncio.create_task(self.schedule_periodic_tasks(interval_minutes))
+        try:
+            await self.run_conversation_loop(proxy=proxy, extension_path=extension_path)
+        finally:
+            scheduler.cancel()
+            try:
+                await scheduler
+            except asyncio.CancelledError:
+                pass
 
 
 # ===============================
 # Main Entry Point
 # ===============================
+def run_async(main):
+    """
+    asyncio.run(main), on a uvloop loop when uvloop is installed (it does not support Windows).
+    uvloop.run uses a loop for this run only and leaves the process-wide event loop policy alone.
+    """
+    if PLATFORM != "windows":
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.run(main)
+    return asyncio.run(main)
+
+
+def run_level1(args):
+    print("Running Level 1: Playwright Automation Flow")
+    agent = BrowserAgent(proxy=args.proxy, interactive=True)
+
+    async def flow():
+        try:
+            await agent.execute_flow()
+        finally:
+            await stop_playwright()
+
+    run_async(flow())
+
+
+def run_level2(args):
+    print("Running Level 2: Native Browser Integration")
+    try:
+        cfg = DemoblazeConfig.from_env()
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    sys_os = PLATFORM
+    if sys_os == "darwin":
+        print(" -> Using AppleScriptNativeAgent (macOS)")
+        native_agent = AppleScriptNativeAgent(browser="chrome", proxy=args.proxy, extension_path=args.extension)
+    elif sys_os in ["windows", "linux"]:
+        print(f" -> Using WindowsLinuxNativeAgent on {sys_os}")
+        native_agent = WindowsLinuxNativeAgent(browser="chrome", proxy=args.proxy, extension_path=args.extension)
+    else:
+        print(f"Unsupported OS: {sys_os}")
+        sys.exit(1)
+    native_agent.complete_flow(url="https://www.demoblaze.com", username=cfg.user,
+                                 password=cfg.password, search_term=cfg.search)
+
+
+def run_level3(args):
+    print("Running Level 3: Cross-Platform + Periodic + Conversational")
+    level3 = Level3Agent()
+    if args.schedule_only:
+        asyncio.run(level3.schedule_periodic_tasks(interval_minutes=1))
+    else:
+        asyncio.run(level3.converse_and_schedule(proxy=args.proxy, extension_path=args.extension,
+                                                 interval_minutes=1))
+
+
+MODES = {
+    "level1": run_level1,
+    "level2": run_level2,
+    "level3": run_level3,
+}
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Choose automation mode.")
-    parser.add_argument("--mode", choices=["level1", "level2", "level3"], default="level1",
+    parser.add_argument("--mode", choices=list(MODES), default="level1",
                         help=("Select 'level1' for Playwright automation (Level 1), "
                               "'level2' for native integration (Level 2), or "
                               "'level3' for conversation & scheduling (Level 3)."))
@@ -662,34 +1442,4 @@ if __name__ == "__main__":
     parser.add_argument("--schedule-only", action="store_true",
                         help="If passed with --mode=level3, runs only the periodic task scheduling loop.")
     args = parser.parse_args()
-    if args.mode == "level1":
-        print("Running Level 1: Playwright Automation Flow")
-        agent = BrowserAgent(proxy=args.proxy)
-        asyncio.run(agent.execute_flow())
-    elif args.mode == "level2":
-        print("Running Level 2: Native Browser Integration")
-        sys_os = platform.system().lower()
-        if sys_os == "darwin":
-            print(" -> Using AppleScriptNativeAgent (macOS)")
-            native_agent = AppleScriptNativeAgent(browser="chrome", proxy=args.proxy, extension_path=args.extension)
-        elif sys_os in ["windows", "linux"]:
-            print(f" -> Using WindowsLinuxNativeAgent on {sys_os}")
-            native_agent = WindowsLinuxNativeAgent(browser="chrome", proxy=args.proxy, extension_path=args.extension)
-        else:
-            print(f"Unsupported OS: {sys_os}")
-            sys.exit(1)
-        username = os.getenv("DEMOBLAZE_USER")
-        password = os.getenv("DEMOBLAZE_PASS")
-        if not username or not password:
-            print("Error: DEMOBLAZE_USER and DEMOBLAZE_PASS must be set in your environment (.env).")
-            sys.exit(1)
-        search_term = os.getenv("DEMOBLAZE_SEARCH", "Samsung")
-        native_agent.complete_flow(url="https://www.demoblaze.com", username=username,
-                                     password=password, search_term=search_term)
-    elif args.mode == "level3":
-        print("Running Level 3: Cross-Platform + Periodic + Conversational")
-        level3 = Level3Agent()
-        if args.schedule_only:
-            level3.schedule_periodic_tasks(interval_minutes=1)
-        else:
-            level3.run_conversation_loop(proxy=args.proxy, extension_path=args.extension)
+    MODES[args.mode](args)